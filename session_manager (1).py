@@ -1,85 +1,192 @@
 import os
-import secrets
+import re
+import heapq
+import json
+import time
 import shutil
 import logging
+from base64 import urlsafe_b64encode
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from typing import Optional, Dict, List, Tuple
 from config import SESSION_ROOT, SESSION_TIMEOUT
 
+_LOG = logging.getLogger('session_manager')
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+    _loads = json.loads
+
+# 'session-' followed by at least 12 URL-safe chars. .match() anchors the
+# start and \Z (unlike $) rejects a trailing newline.
+_SESSION_ID_RE = re.compile(r'session-[a-zA-Z0-9_-]{12,}\Z')
+
+# Filesystem metadata calls release the GIL, so per-session scans overlap well
+_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+_SUBDIRS = ('uploads', 'extracted', 'translated', 'refined', 'final', 'results')
+
+
+def _tree_size(root: str) -> int:
+    """Sum sizes of non-directory entries under root without following symlinks"""
+    total = 0
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+def _fast_rmtree(root: str) -> None:
+    """Remove a directory tree with direct unlink/rmdir calls, without following symlinks"""
+    dirs = [root]
+    i = 0
+    while i < len(dirs):
+        with os.scandir(dirs[i]) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                else:
+                    os.unlink(entry.path)
+        i += 1
+    # Children are always appended after their parent, so reverse order is bottom-up
+    for d in reversed(dirs):
+        os.rmdir(d)
+
+
+def _read_metadata(path) -> Dict:
+    """Read and parse a session metadata file with a single unbuffered read"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        data = os.read(fd, 4096)
+        if len(data) == 4096:
+            # Far larger than any metadata we write; read the remainder
+            while True:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                data += chunk
+    finally:
+        os.close(fd)
+    return _loads(data) if data else {}
+
+
+def _write_metadata(path, metadata: Dict) -> None:
+    """Serialize metadata once and write it with a single unbuffered syscall"""
+    data = _dumps(metadata)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def _count_suffix(dirpath, suffix: str) -> int:
+    """Count non-directory entries in dirpath ending with suffix, 0 if missing"""
+    try:
+        with os.scandir(dirpath) as it:
+            return sum(1 for e in it if e.name.endswith(suffix) and not e.is_dir())
+    except FileNotFoundError:
+        return 0
+
+
+def _count_entries(dirpath) -> int:
+    """Count entries in dirpath, 0 if missing"""
+    try:
+        with os.scandir(dirpath) as it:
+            return sum(1 for _ in it)
+    except FileNotFoundError:
+        return 0
+
 
 class SessionManager:
     def __init__(self, storage_path: Optional[str] = None):
         """Initialize session manager with storage configuration"""
         self.storage_path = Path(storage_path or SESSION_ROOT)
         self.storage_path.mkdir(exist_ok=True, parents=True)
-        self.logger = logging.getLogger('session_manager')
+        # Internal path building works on strings; Path is only built for return values
+        self._storage_dir = str(self.storage_path)
         self.session_timeout = SESSION_TIMEOUT
+        # metadata file path -> ((st_mtime_ns, st_size), expires_ts) from its last parse
+        self._expiry_cache: Dict[str, Tuple[Tuple[int, int], float]] = {}
 
 
     @staticmethod
     def validate_session_id(session_id: str) -> bool:
         """Static method to validate session ID format consistently"""
-        if not session_id:
-            return False
-            
-        # Must start with 'session-' followed by at least 12 alphanumeric chars
-        import re
-        pattern = r'^session-[a-zA-Z0-9_-]{12,}$'
-        return bool(re.match(pattern, session_id))
+        return bool(session_id) and _SESSION_ID_RE.match(session_id) is not None
 
     def create_session(self) -> Path:
         """Create a new session with unique ID and directory structure"""
         max_attempts = 10
         
         for _ in range(max_attempts):
+            # Generated IDs are valid by construction; mkdir itself detects the
+            # (vanishingly rare, 128-bit) collision instead of a separate exists()
             session_id = self._generate_session_id()
-            if not self.validate_session_id(session_id):
+            sp = os.path.join(self._storage_dir, session_id)
+            
+            try:
+                os.mkdir(sp)
+            except FileExistsError:
+                continue
+            except OSError as e:
+                _LOG.error(f"Failed to create session {session_id}: {e}")
                 continue
-                
-            session_path = self.storage_path / session_id
             
-            if not session_path.exists():
-                try:
-                    session_path.mkdir(parents=True)
-                    
-                    subdirs = ['uploads', 'extracted', 'translated', 'refined', 'final', 'results']
-                    for subdir in subdirs:
-                        (session_path / subdir).mkdir()
-                    
-                    metadata_file = session_path / '.session_metadata'
-                    metadata = {
-                        'created': datetime.now().isoformat(),
-                        'session_id': session_id,
-                        'status': 'active'
-                    }
-                    import json
-                    with open(metadata_file, 'w') as f:
-                        json.dump(metadata, f)
-                    
-                    self.logger.info(f"Created new session: {session_id}")
-                    return session_path
-                    
-                except OSError as e:
-                    self.logger.error(f"Failed to create session {session_id}: {e}")
-                    if session_path.exists():
-                        shutil.rmtree(session_path, ignore_errors=True)
-                    continue
+            try:
+                for subdir in _SUBDIRS:
+                    os.mkdir(sp + os.sep + subdir)
+                
+                metadata_file = os.path.join(sp, '.session_metadata')
+                now = time.time()
+                metadata = {
+                    'created': datetime.fromtimestamp(now).isoformat(),
+                    'created_ts': now,
+                    'expires_ts': now + self.session_timeout,
+                    'session_id': session_id,
+                    'status': 'active'
+                }
+                _write_metadata(metadata_file, metadata)
+                self._expiry_cache.pop(metadata_file, None)
+                
+                if _LOG.isEnabledFor(logging.INFO):
+                    _LOG.info(f"Created new session: {session_id}")
+                return Path(sp)
+                
+            except OSError as e:
+                _LOG.error(f"Failed to create session {session_id}: {e}")
+                shutil.rmtree(sp, ignore_errors=True)
         
         raise RuntimeError("Failed to create unique session after multiple attempts")
 
     def get_session_path(self, session_id: str) -> Path:
         """Get path for existing session with validation"""
+        return Path(self._get_session_dir(session_id))
+
+    def _get_session_dir(self, session_id: str) -> str:
+        """String form of get_session_path for internal callers"""
         if not self.validate_session_id(session_id):
             raise ValueError(f"Invalid session ID format: {session_id}")
         
-        session_path = self.storage_path / session_id
+        session_path = os.path.join(self._storage_dir, session_id)
         
-        if not session_path.exists():
+        if not os.path.exists(session_path):
             raise FileNotFoundError(f"Session {session_id} not found")
         
         if self._is_session_expired(session_path):
-            self.logger.warning(f"Attempted to access expired session: {session_id}")
+            _LOG.warning(f"Attempted to access expired session: {session_id}")
             raise ValueError(f"Session {session_id} has expired")
         
         return session_path
@@ -87,129 +194,176 @@ class SessionManager:
     def delete_session(self, session_id: str) -> bool:
         """Delete a session and all its files"""
         try:
-            session_path = self.get_session_path(session_id)
-            shutil.rmtree(session_path)
-            self.logger.info(f"Deleted session: {session_id}")
+            session_path = self._get_session_dir(session_id)
+            _fast_rmtree(session_path)
+            self._expiry_cache.pop(os.path.join(session_path, '.session_metadata'), None)
+            if _LOG.isEnabledFor(logging.INFO):
+                _LOG.info(f"Deleted session: {session_id}")
             return True
         except Exception as e:
-            self.logger.error(f"Failed to delete session {session_id}: {e}")
+            _LOG.error(f"Failed to delete session {session_id}: {e}")
             return False
 
-    def list_active_sessions(self) -> List[Dict[str, any]]:
-        """List all active (non-expired) sessions"""
+    def list_active_sessions(self, limit: Optional[int] = None) -> List[Dict[str, any]]:
+        """List active (non-expired) sessions, newest first, optionally only the newest `limit`"""
         sessions = []
         
-        for session_dir in self.storage_path.iterdir():
-            if session_dir.is_dir() and not session_dir.name.startswith('.'):
-                try:
-                    metadata_file = session_dir / '.session_metadata'
-                    if metadata_file.exists():
-                        import json
-                        with open(metadata_file, 'r') as f:
-                            metadata = json.load(f)
+        for session_dir in self._session_dirs():
+            try:
+                metadata_file = os.path.join(session_dir, '.session_metadata')
+                if os.path.exists(metadata_file):
+                    metadata = _read_metadata(metadata_file)
+                    
+                    if not self._is_session_expired(session_dir, metadata):
+                        metadata['file_count'] = _count_suffix(os.path.join(session_dir, 'uploads'), '.html')
+                        metadata['has_results'] = os.path.exists(os.path.join(session_dir, 'results', 'batch-output.zip'))
+                        sessions.append(metadata)
                         
-                        if not self._is_session_expired(session_dir):
-                            metadata['file_count'] = len(list((session_dir / 'uploads').glob('*.html')))
-                            metadata['has_results'] = (session_dir / 'results' / 'batch-output.zip').exists()
-                            sessions.append(metadata)
-                            
-                except Exception as e:
-                    self.logger.warning(f"Error reading session {session_dir.name}: {e}")
-                    continue
+            except Exception as e:
+                _LOG.warning(f"Error reading session {os.path.basename(session_dir)}: {e}")
+                continue
         
-        return sorted(sessions, key=lambda x: x.get('created', ''), reverse=True)
+        if limit is not None:
+            return heapq.nlargest(limit, sessions, key=self._created_sort_key)
+        return sorted(sessions, key=self._created_sort_key, reverse=True)
+
+    def _created_sort_key(self, metadata: Dict) -> float:
+        """Creation time for newest-first ordering, including legacy metadata"""
+        return self._session_times(metadata)[0] or 0.0
+
+    def _session_dirs(self) -> List[str]:
+        """Paths of session directories in storage, filtered by name before any stat"""
+        with os.scandir(self._storage_dir) as it:
+            return [e.path for e in it
+                    if e.name.startswith('session-') and e.is_dir(follow_symlinks=False)]
 
     def _generate_session_id(self) -> str:
         """Generate a secure random session ID"""
-        # Generate longer IDs for better uniqueness
-        return f"session-{secrets.token_urlsafe(16)}"
+        # 16 random bytes, encoded exactly as secrets.token_urlsafe(16) would
+        return 'session-' + urlsafe_b64encode(os.urandom(16)).rstrip(b'=').decode('ascii')
 
-    def _is_session_expired(self, session_path: Path) -> bool:
-        """Check if a session has expired based on creation time"""
+    def _is_session_expired(self, session_path: str, metadata: Optional[Dict] = None) -> bool:
+        """Check if a session has expired, reusing already-parsed metadata if given"""
         try:
-            metadata_file = session_path / '.session_metadata'
-            if metadata_file.exists():
-                import json
-                with open(metadata_file, 'r') as f:
-                    metadata = json.load(f)
-                
-                created_str = metadata.get('created')
-                if created_str:
-                    created_time = datetime.fromisoformat(created_str)
-                    age = datetime.now() - created_time
-                    return age.total_seconds() > self.session_timeout
+            if metadata is None:
+                metadata_file = os.path.join(session_path, '.session_metadata')
+                try:
+                    st = os.stat(metadata_file)
+                except FileNotFoundError:
+                    pass
+                else:
+                    # Unchanged mtime and size mean expires_ts is unchanged; skip the parse.
+                    # Size guards against rewrites within one coarse mtime tick.
+                    signature = (st.st_mtime_ns, st.st_size)
+                    cached = self._expiry_cache.get(metadata_file)
+                    if cached is not None and cached[0] == signature:
+                        return time.time() > cached[1]
+                    
+                    expires_ts = self._session_times(_read_metadata(metadata_file))[1]
+                    if expires_ts is not None:
+                        self._expiry_cache[metadata_file] = (signature, expires_ts)
+                        return time.time() > expires_ts
+            else:
+                expires_ts = self._session_times(metadata)[1]
+                if expires_ts is not None:
+                    return time.time() > expires_ts
             
-            stat = session_path.stat()
-            age = datetime.now() - datetime.fromtimestamp(stat.st_mtime)
-            return age.total_seconds() > self.session_timeout
+            return time.time() - os.stat(session_path).st_mtime > self.session_timeout
             
         except Exception as e:
-            self.logger.warning(f"Error checking session expiry: {e}")
+            _LOG.warning(f"Error checking session expiry: {e}")
             return True
 
+    def _session_times(self, metadata: Dict) -> Tuple[Optional[float], Optional[float]]:
+        """Return (created_ts, expires_ts), deriving them for metadata written before they were stored"""
+        created_ts = metadata.get('created_ts')
+        if created_ts is None and metadata.get('created'):
+            # Legacy metadata only has the ISO string; just these files pay the parse
+            created_ts = datetime.fromisoformat(metadata['created']).timestamp()
+        
+        expires_ts = metadata.get('expires_ts')
+        if expires_ts is None and created_ts is not None:
+            expires_ts = created_ts + self.session_timeout
+        
+        return created_ts, expires_ts
+
     def _cleanup_stale_sessions(self):
         """Remove expired sessions to free up disk space"""
         try:
-            cleaned = 0
-            errors = 0
-            
-            for session_dir in self.storage_path.iterdir():
-                if session_dir.is_dir() and not session_dir.name.startswith('.'):
-                    if self._is_session_expired(session_dir):
-                        try:
-                            shutil.rmtree(session_dir)
-                            cleaned += 1
-                            self.logger.info(f"Cleaned up expired session: {session_dir.name}")
-                        except Exception as e:
-                            errors += 1
-                            self.logger.error(f"Failed to clean up session {session_dir.name}: {e}")
-            
-            if cleaned > 0:
-                self.logger.info(f"Session cleanup completed: {cleaned} sessions removed, {errors} errors")
-                
+            self.sweep(cleanup=True, measure=False)
         except Exception as e:
-            self.logger.error(f"Session cleanup failed: {e}")
+            _LOG.error(f"Session cleanup failed: {e}")
+
+    def _sweep_session(self, session_dir: str, cleanup: bool, measure: bool) -> Tuple[bool, int, Optional[bool]]:
+        """Return (expired, bytes left on disk, removal outcome or None) for one session directory"""
+        expired = self._is_session_expired(session_dir)
+        if expired and cleanup:
+            name = os.path.basename(session_dir)
+            try:
+                _fast_rmtree(session_dir)
+                self._expiry_cache.pop(os.path.join(session_dir, '.session_metadata'), None)
+                if _LOG.isEnabledFor(logging.INFO):
+                    _LOG.info(f"Cleaned up expired session: {name}")
+                return expired, 0, True
+            except Exception as e:
+                _LOG.error(f"Failed to clean up session {name}: {e}")
+                # Whatever the failed removal left behind is still on disk
+                return expired, self._session_size(session_dir) if measure else 0, False
+        
+        return expired, self._session_size(session_dir) if measure else 0, None
+
+    def _session_size(self, session_dir: str) -> int:
+        """Bytes under session_dir, 0 if it vanished or could not be read"""
+        try:
+            return _tree_size(session_dir)
+        except FileNotFoundError:
+            # Removed mid-scan, e.g. by delete_session or another worker
+            return 0
+        except OSError as e:
+            _LOG.warning(f"Error measuring session {os.path.basename(session_dir)}: {e}")
+            return 0
 
     def get_session_info(self, session_id: str) -> Optional[Dict[str, any]]:
         """Get detailed information about a specific session"""
         try:
-            session_path = self.get_session_path(session_id)
+            session_path = self._get_session_dir(session_id)
             
-            metadata_file = session_path / '.session_metadata'
-            metadata = {}
-            
-            if metadata_file.exists():
-                import json
-                with open(metadata_file, 'r') as f:
-                    metadata = json.load(f)
+            metadata_file = os.path.join(session_path, '.session_metadata')
+            try:
+                metadata = _read_metadata(metadata_file)
+            except FileNotFoundError:
+                metadata = {}
             
             metadata['session_id'] = session_id
-            metadata['path'] = str(session_path)
+            metadata['path'] = session_path
+            
+            # One listing tells us which subdirectories exist; only those get opened
+            with os.scandir(session_path) as it:
+                subdirs = {e.name for e in it if e.is_dir()}
             
-            metadata['files'] = {
-                'uploads': len(list((session_path / 'uploads').glob('*.html'))),
-                'extracted': len(list((session_path / 'extracted').iterdir())) if (session_path / 'extracted').exists() else 0,
-                'translated': len(list((session_path / 'translated').iterdir())) if (session_path / 'translated').exists() else 0,
-                'refined': len(list((session_path / 'refined').iterdir())) if (session_path / 'refined').exists() else 0,
-                'final': len(list((session_path / 'final').iterdir())) if (session_path / 'final').exists() else 0,
+            files = {
+                'uploads': _count_suffix(os.path.join(session_path, 'uploads'), '.html') if 'uploads' in subdirs else 0,
             }
+            for name in ('extracted', 'translated', 'refined', 'final'):
+                files[name] = _count_entries(os.path.join(session_path, name)) if name in subdirs else 0
+            metadata['files'] = files
             
-            results_dir = session_path / 'results'
-            if results_dir.exists():
-                metadata['results'] = [f.name for f in results_dir.glob('*.zip')]
+            if 'results' in subdirs:
+                with os.scandir(os.path.join(session_path, 'results')) as it:
+                    metadata['results'] = [e.name for e in it if e.name.endswith('.zip')]
             else:
                 metadata['results'] = []
             
-            if 'created' in metadata:
-                created_time = datetime.fromisoformat(metadata['created'])
-                age = datetime.now() - created_time
-                metadata['age_minutes'] = int(age.total_seconds() / 60)
-                metadata['expires_in_minutes'] = max(0, int((self.session_timeout - age.total_seconds()) / 60))
+            created_ts, expires_ts = self._session_times(metadata)
+            if created_ts is not None:
+                now = time.time()
+                metadata['age_minutes'] = int((now - created_ts) / 60)
+                metadata['expires_in_minutes'] = max(0, int((expires_ts - now) / 60))
             
             return metadata
             
         except Exception as e:
-            self.logger.error(f"Error getting session info for {session_id}: {e}")
+            _LOG.error(f"Error getting session info for {session_id}: {e}")
             return None
 
     def extend_session(self, session_id: str, additional_time: int = 3600) -> bool:
@@ -218,56 +372,75 @@ class SessionManager:
             if not self.validate_session_id(session_id):
                 return False
                 
-            session_path = self.get_session_path(session_id)
-            metadata_file = session_path / '.session_metadata'
+            session_path = self._get_session_dir(session_id)
+            metadata_file = os.path.join(session_path, '.session_metadata')
             
-            if metadata_file.exists():
-                import json
-                with open(metadata_file, 'r') as f:
-                    metadata = json.load(f)
+            if os.path.exists(metadata_file):
+                metadata = _read_metadata(metadata_file)
                 
-                metadata['created'] = datetime.now().isoformat()
+                now = time.time()
+                now_iso = datetime.fromtimestamp(now).isoformat()
+                metadata['created'] = now_iso
+                metadata['created_ts'] = now
+                metadata['expires_ts'] = now + self.session_timeout
                 metadata['extended'] = True
-                metadata['extended_at'] = datetime.now().isoformat()
+                metadata['extended_at'] = now_iso
                 
-                with open(metadata_file, 'w') as f:
-                    json.dump(metadata, f)
+                _write_metadata(metadata_file, metadata)
+                self._expiry_cache.pop(metadata_file, None)
                 
-                self.logger.info(f"Extended session {session_id} by {additional_time} seconds")
+                if _LOG.isEnabledFor(logging.INFO):
+                    _LOG.info(f"Extended session {session_id} by {additional_time} seconds")
                 return True
                 
         except Exception as e:
-            self.logger.error(f"Failed to extend session {session_id}: {e}")
+            _LOG.error(f"Failed to extend session {session_id}: {e}")
             return False
 
+    def sweep(self, cleanup: bool = True, measure: bool = True) -> Dict[str, any]:
+        """Scan all sessions once, collecting storage stats and optionally removing expired ones.
+        
+        total_size_mb counts what is left on disk after the sweep. With cleanup,
+        'cleaned' and 'cleanup_errors' report the removals.
+        """
+        paths = self._session_dirs()
+        
+        # Forget sessions removed by other workers or outside this process
+        live = {os.path.join(p, '.session_metadata') for p in paths}
+        for key in [k for k in list(self._expiry_cache) if k not in live]:
+            self._expiry_cache.pop(key, None)
+        
+        with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as ex:
+            results = list(ex.map(self._sweep_session, paths, repeat(cleanup), repeat(measure)))
+        
+        session_count = len(results)
+        expired_count = sum(1 for expired, _, _ in results if expired)
+        total_size = sum(size for _, size, _ in results)
+        
+        stats = {
+            'total_sessions': session_count,
+            'active_sessions': session_count - expired_count,
+            'expired_sessions': expired_count,
+            'total_size_mb': round(total_size / (1024 * 1024), 2),
+            'storage_path': self._storage_dir
+        }
+        
+        if cleanup:
+            outcomes = [removed for _, _, removed in results]
+            stats['cleaned'] = outcomes.count(True)
+            stats['cleanup_errors'] = outcomes.count(False)
+            if stats['cleaned'] > 0 and _LOG.isEnabledFor(logging.INFO):
+                _LOG.info(f"Session cleanup completed: {stats['cleaned']} sessions removed, {stats['cleanup_errors']} errors")
+        
+        return stats
+
     def get_storage_stats(self) -> Dict[str, any]:
         """Get storage statistics for all sessions"""
         try:
-            total_size = 0
-            session_count = 0
-            expired_count = 0
-            
-            for session_dir in self.storage_path.iterdir():
-                if session_dir.is_dir() and not session_dir.name.startswith('.'):
-                    session_count += 1
-                    
-                    size = sum(f.stat().st_size for f in session_dir.rglob('*') if f.is_file())
-                    total_size += size
-                    
-                    if self._is_session_expired(session_dir):
-                        expired_count += 1
-            
-            return {
-                'total_sessions': session_count,
-                'active_sessions': session_count - expired_count,
-                'expired_sessions': expired_count,
-                'total_size_mb': round(total_size / (1024 * 1024), 2),
-                'storage_path': str(self.storage_path)
-            }
-            
+            return self.sweep(cleanup=False)
         except Exception as e:
-            self.logger.error(f"Error getting storage stats: {e}")
+            _LOG.error(f"Error getting storage stats: {e}")
             return {
                 'error': str(e),
-                'storage_path': str(self.storage_path)
+                'storage_path': self._storage_dir
             }
\ No newline at end of file